@@ -5,6 +5,10 @@ AIRPORT_NAME = 'Montréal-Trudeau International Airport'
 # Analysis Parameters
 TURNAROUND_THRESHOLD_MINUTES = 90  # Minimum turnaround time in minutes to flag
 
+# API Parameters
+POLL_INTERVAL_SECONDS = 900  # Time between passes when monitor.py runs with --daemon
+
 # File Paths for Data Storage
 LOG_FILE_PATH = 'data/logs/turnaround_log.csv'
+CLEANED_CACHE_PATH = 'data/logs/turnaround_log_cleaned.parquet'
 REPORT_IMAGE_PATH = 'data/reports/daily_turnaround_analysis.png'
\ No newline at end of file
@@ -1,30 +1,85 @@
 # SECTION 1: IMPORTS & SETUP
 
 import os
+import argparse
+import atexit
 import requests
+import orjson
 import csv
-import json
+import sqlite3
+import time
+from collections import namedtuple
+from functools import lru_cache
 from datetime import datetime, timezone
 from dotenv import load_dotenv
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-from config import AIRPORT_IATA, AIRPORT_NAME, TURNAROUND_THRESHOLD_MINUTES, LOG_FILE_PATH
+from config import AIRPORT_IATA, AIRPORT_NAME, TURNAROUND_THRESHOLD_MINUTES, LOG_FILE_PATH, POLL_INTERVAL_SECONDS
 
-load_dotenv()
-# AVIATION_STACK_API_KEY = os.getenv('AVIATIONSTACK_API_KEY')
-SLACK_WEBHOOK_URL = os.getenv('SLACK_WEBHOOK_URL')
-STATE_FILE = 'flight_tracker.json'
- 
-# API_BASE_URL = 'http://api.aviationstack.com/v1/flights'
+STATE_FILE = 'flight_tracker.db'
+
+# Column order of the turnaround log CSV
+LOG_FIELDNAMES = ('log_timestamp_utc', 'flight_iata', 'airline', 'origin_country', 'last_contact_time_utc', 'minutes_on_ground')
+
+# One logged observation; a plain tuple in CSV column order, so rows are written as-is
+FlightLogEntry = namedtuple('FlightLogEntry', LOG_FIELDNAMES)
+
+# Long-lived handle and writer for the CSV log, opened on first use
+_LOG_FH = None
+_LOG_WRITER = None
+
+# Connection to the flight tracker database, opened on first use
+_STATE_CONN = None
+
+# Legacy aviationstack source, only used when AVIATIONSTACK_API_KEY is set
+API_BASE_URL = 'http://api.aviationstack.com/v1/flights'
+
+@lru_cache(maxsize=1)
+def _env():
+    """
+    Loads the .env file on first use and returns the credentials the monitor needs.
+    Deferred so a run that never alerts doesn't scan for .env at all.
+    """
+    load_dotenv()
+    return {
+        'slack': os.getenv('SLACK_WEBHOOK_URL'),
+        'aviationstack': os.getenv('AVIATIONSTACK_API_KEY')
+    }
+
+# One shared session for every outbound call, so the TCP+TLS connection to each
+# host is kept alive and reused instead of being re-negotiated on every request.
+# Compression is pinned explicitly: the OpenSky JSON shrinks several times over the wire,
+# and response.content hands the decoded bytes straight to orjson without a str copy.
+SESSION = requests.Session()
+SESSION.headers.update({'Accept-Encoding': 'gzip, deflate', 'User-Agent': 'yul-monitor/1.0'})
+# Transient failures (5xx, resets) are retried inside the pool with exponential backoff,
+# for the Slack POST as well as the GETs.
+_RETRY = Retry(
+    total=3,
+    backoff_factor=0.5,
+    status_forcelist=(500, 502, 503, 504),
+    allowed_methods=frozenset({'GET', 'POST'})
+)
+_ADAPTER = HTTPAdapter(pool_connections=4, pool_maxsize=10, max_retries=_RETRY)
+SESSION.mount('https://', _ADAPTER)
+SESSION.mount('http://', _ADAPTER)
 
 # SECTION 2: FETCHING DATA 
 
 def fetch_flight_data():
     """
-    Fetches flight data from the aviationstack API
+    Fetches flight data from the aviationstack API.
+    Returns an empty list without calling the API if no key is configured.
     """
 
+    api_key = _env()['aviationstack']
+    if not api_key:
+        print("No AVIATIONSTACK_API_KEY configured. Skipping aviationstack fetch.")
+        return []
+
     params = {
-        'access_key': AVIATION_STACK_API_KEY,
+        'access_key': api_key,
         'flight_iata': AIRPORT_IATA,
         'flight_status': 'landed',  # 'landed' could be used if we want only completed flights
         # 'limit': 100
@@ -33,14 +88,14 @@ def fetch_flight_data():
     print("Fetching live flight data...")
 
     try:
-        response = requests.get(API_BASE_URL, params=params)
+        response = SESSION.get(API_BASE_URL, params=params, timeout=15)
         response.raise_for_status()
 
-        data = response.json().get('data', [])
+        data = orjson.loads(response.content).get('data', [])
         print(f"Successfuly Fetched data for {len(data)} landed flights records.")
         return data
     
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"Error: could not fetch data from aviationstack API. {e}")
         return []
 
@@ -61,10 +116,11 @@ def fetch_opensky_data():
     print("Fetching live flight data from OpenSky Network...")
 
     try:
-        response = requests.get(OPENSKY_API_URL, params=params, timeout=15)
+        response = SESSION.get(OPENSKY_API_URL, params=params, timeout=15)
         response.raise_for_status()
 
-        state_vectors = response.json().get('states', [])
+        # orjson decodes the large states array much faster than the stdlib json module
+        state_vectors = orjson.loads(response.content).get('states', [])
 
         if state_vectors is None:
             print("No state vectors found in the OpenSky response.")
@@ -73,39 +129,72 @@ def fetch_opensky_data():
         print(f"Successfully fetched state vectors for {len(state_vectors)} aircraft in the YUL area from OpenSky.")
         return state_vectors
     
-    except requests.exceptions.RequestException as e:
+    except (requests.exceptions.RequestException, orjson.JSONDecodeError) as e:
         print(f"Error: could not fetch data from OpenSky Network API. {e}")
         return []
 
 
 # SECTION 3: PROCESSING DATA & LOGGING
+def _get_state_db():
+    """
+    Opens the flight tracker database once per process.
+    Creates the tracker table (one row per callsign) on first use.
+    """
+    global _STATE_CONN
+
+    if _STATE_CONN is None:
+        _STATE_CONN = sqlite3.connect(STATE_FILE)
+        _STATE_CONN.execute(
+            'CREATE TABLE IF NOT EXISTS tracker('
+            'callsign TEXT PRIMARY KEY, first_seen_ts INTEGER NOT NULL, alert_sent INTEGER NOT NULL DEFAULT 0)'
+        )
+        atexit.register(_STATE_CONN.close)
+
+    return _STATE_CONN
+
 def load_state():
-    """Loads the flight tracking data from a JSON file."""
-    try:
-        with open(STATE_FILE, 'r') as f:
-            state_data = json.load(f)
-            # Convert string timestamps back to datetime objects
-            for callsign, data in state_data.items():
-                data['first_seen_utc'] = datetime.fromisoformat(data['first_seen_utc'])
-            return state_data
-    except FileNotFoundError:
-        return {} # No state file found, start fresh
+    """Loads the flight tracking data from the SQLite state database."""
+    rows = _get_state_db().execute('SELECT callsign, first_seen_ts, alert_sent FROM tracker').fetchall()
+    return {
+        callsign: {'first_seen_ts': first_seen_ts, 'alert_sent': bool(alert_sent)}
+        for callsign, first_seen_ts, alert_sent in rows
+    }
 
 def save_state(state_data):
-    """Saves the flight tracking data to a JSON file."""
-    # Convert datetime objects to strings for JSON serialization
-    serializable_data = {}
-    for callsign, data in state_data.items():
-        serializable_data[callsign] = {
-            'first_seen_utc': data['first_seen_utc'].isoformat()
-        }
-    with open(STATE_FILE, 'w') as f:
-        json.dump(serializable_data, f, indent=4)
+    """
+    Saves the flight tracking data to the SQLite state database.
+    Inserts newly seen callsigns and deletes the ones no longer tracked,
+    all in a single transaction. Existing rows are not rewritten: first_seen_ts never changes,
+    and alert_sent is only set by _mark_alerted() once the Slack post has gone through.
+    """
+    conn = _get_state_db()
+    with conn:
+        conn.executemany(
+            'INSERT INTO tracker(callsign, first_seen_ts) VALUES (?, ?) '
+            'ON CONFLICT(callsign) DO NOTHING',
+            [(callsign, data['first_seen_ts']) for callsign, data in state_data.items()]
+        )
+        placeholders = ','.join('?' * len(state_data))
+        conn.execute(f'DELETE FROM tracker WHERE callsign NOT IN ({placeholders})', tuple(state_data))
+
+def _mark_alerted(callsigns):
+    """Records a successful Slack alert by flagging its callsigns as alerted, in one transaction."""
+    conn = _get_state_db()
+    with conn:
+        conn.executemany('UPDATE tracker SET alert_sent = 1 WHERE callsign = ?', [(callsign,) for callsign in callsigns])
+
+@lru_cache(maxsize=4096)
+def _iso_utc(unix_seconds):
+    """
+    Formats integer Unix seconds as an ISO-8601 UTC string (e.g. 2025-09-04T21:15:01+00:00).
+    Many aircraft share the same last-contact second, so results are cached.
+    """
+    return time.strftime('%Y-%m-%dT%H:%M:%S+00:00', time.gmtime(unix_seconds))
 
 def process_and_log_data(state_vectors):
     """
     Processes OpenSky state vector data to identify aircraft on the ground,
-    calculates true time on ground using a persistent state file,
+    calculates true time on ground using the persistent tracker database,
     and logs relevant information to a CSV file.
     """
     if not state_vectors:
@@ -117,82 +206,108 @@ def process_and_log_data(state_vectors):
     # Load the memory of planes we are already tracking
     state_tracker = load_state()
     
-    current_time_utc = datetime.now(timezone.utc)
+    # Read the clock once per run; every aircraft in this pass shares the same timestamp.
+    # Time on ground is plain integer math on Unix seconds, no datetime objects per aircraft.
+    current_time = time.time()
+    current_ts = int(current_time)
+    current_time_iso = datetime.fromtimestamp(current_time, tz=timezone.utc).isoformat()
     all_grounded_flights_log = []
     flagged_for_alert = []
     
     # Keep track of planes seen in this specific API call
     current_live_callsigns = set()
 
-    for state in state_vectors:
+    # We only care about aircraft that are on the ground (state[8] is 'on_ground')
+    # and have a non-blank callsign (state[1]), so drop the rest before the main loop;
+    # the "Processed" count below then matches the rows written.
+    grounded = [state for state in state_vectors if state[8] and state[1] and state[1].strip()]
+
+    for state in grounded:
         # State vector indices based on OpenSky API documentation
         # 0: icao24, 1: callsign, 2: origin_country, 3: time_position,
         # 4: last_contact, 5: longitude, 6: latitude, 7: baro_altitude,
         # 8: on_ground, 9: velocity, 10: true_track, 11: vertical_rate,
         # 12: sensors, 13: geo_altitude, 14: squawk, 15: spi, 16: position_source
 
-        # We only care about aircraft that are on the ground.
-        if state[8] is True:  # state[8] is 'on_ground'
-            callsign = state[1].strip() if state[1] else 'N/A'
-            if callsign == 'N/A':
-                continue # Skip entries without a proper callsign
-
-            current_live_callsigns.add(callsign)
-
-            # --- STATEFUL LOGIC START ---
-            if callsign not in state_tracker:
-                # NEW PLANE DETECTED: Record its landing time.
-                state_tracker[callsign] = {
-                    'first_seen_utc': current_time_utc
-                }
-                true_minutes_on_ground = 0
-            else:
-                # EXISTING PLANE: Calculate total time since first detection.
-                first_seen_time = state_tracker[callsign]['first_seen_utc']
-                duration = current_time_utc - first_seen_time
-                true_minutes_on_ground = int(duration.total_seconds() / 60)
-            # --- STATEFUL LOGIC END ---
-
-            # Log entry creation
-            flight_log_entry = {
-                'log_timestamp_utc': current_time_utc.isoformat(),
-                'flight_iata': callsign,
-                'airline': "Unknown",
-                'origin_country': state[2] if state[2] else 'N/A',
-                'last_contact_time_utc': datetime.fromtimestamp(state[4], tz=timezone.utc).isoformat(),
-                'minutes_on_ground': true_minutes_on_ground # Use the correct calculation here
+        callsign = state[1].strip()
+
+        current_live_callsigns.add(callsign)
+
+        # --- STATEFUL LOGIC START ---
+        # Look the plane up once and keep working on its entry
+        tracked = state_tracker.get(callsign)
+        if tracked is None:
+            # NEW PLANE DETECTED: Record its landing time.
+            tracked = state_tracker[callsign] = {
+                'first_seen_ts': current_ts,
+                'alert_sent': False
             }
-            all_grounded_flights_log.append(flight_log_entry)
+            true_minutes_on_ground = 0
+        else:
+            # EXISTING PLANE: Calculate total time since first detection.
+            true_minutes_on_ground = (current_ts - tracked['first_seen_ts']) // 60
+        # --- STATEFUL LOGIC END ---
+
+        # Log entry creation
+        flight_log_entry = FlightLogEntry(
+            log_timestamp_utc=current_time_iso,
+            flight_iata=callsign,
+            airline="Unknown",
+            origin_country=state[2] if state[2] else 'N/A',
+            last_contact_time_utc=_iso_utc(state[4]),
+            minutes_on_ground=true_minutes_on_ground # Use the correct calculation here
+        )
+        all_grounded_flights_log.append(flight_log_entry)
 
-            # Check threshold for alerts
-            if true_minutes_on_ground > TURNAROUND_THRESHOLD_MINUTES:
-                # Optional: prevent sending duplicate alerts every run
-                if not state_tracker[callsign].get('alert_sent', False):
-                    flagged_for_alert.append(flight_log_entry)
-                    state_tracker[callsign]['alert_sent'] = True # Mark alert as sent
+        # Check threshold for alerts, and prevent sending duplicate alerts every run.
+        # alert_sent is only set by send_slack_alert once the post succeeds, so a failed alert is retried next run.
+        if true_minutes_on_ground > TURNAROUND_THRESHOLD_MINUTES and not tracked['alert_sent']:
+            flagged_for_alert.append(flight_log_entry)
 
     # --- CLEANUP LOGIC ---
     # Remove planes from tracker that have departed (are no longer seen on ground)
-    departed_planes = set(state_tracker.keys()) - current_live_callsigns
+    departed_planes = state_tracker.keys() - current_live_callsigns
     for callsign in departed_planes:
         print(f"Removing departed flight {callsign} from tracker.")
         del state_tracker[callsign]
 
-    # Save updated state back to file for next run
+    # Save updated state back to the tracker database for next run
     save_state(state_tracker)
 
     # Log all currently grounded flights to CSV
     _save_logs_to_csv(all_grounded_flights_log)
 
-    print(f"Processed {len(state_vectors)} aircraft. Found {len(all_grounded_flights_log)} on the ground. {len(flagged_for_alert)} flagged.")
+    print(f"Fetched {len(state_vectors)} aircraft. Processed {len(grounded)} on the ground. {len(flagged_for_alert)} flagged.")
     return flagged_for_alert
 
+def _get_log_writer():
+    """
+    Opens the CSV log once per process and returns a writer for it.
+    The file handle stays open with a large buffer and is closed (and flushed) at exit,
+    so repeated saves don't pay for an open/close each time.
+    Writes the header row only if the file is brand new or empty.
+    """
+    global _LOG_FH, _LOG_WRITER
+
+    if _LOG_WRITER is None:
+        _LOG_FH = open(LOG_FILE_PATH, mode='a', newline='', encoding='utf-8', buffering=1 << 16)
+        atexit.register(_LOG_FH.close)
+        _LOG_WRITER = csv.writer(_LOG_FH)
+
+        if os.path.getsize(LOG_FILE_PATH) == 0:
+            _LOG_WRITER.writerow(LOG_FIELDNAMES)
+
+    return _LOG_WRITER
+
+def _flush_logs():
+    """Flushes buffered CSV rows to disk, if the log has been opened."""
+    if _LOG_FH is not None:
+        _LOG_FH.flush()
+
 def _save_logs_to_csv(log_entries):
     """
     Internal helper function to append log entries to our CSV file.
-    Saves log entries to a CSV file.
-    Creates the file with headers if it doesn't exist.
-    Appends to it if it does.
+    Appends through the long-lived writer from _get_log_writer().
     """
 
     # Guard clause:
@@ -200,19 +315,8 @@ def _save_logs_to_csv(log_entries):
         # If the list is empty, there is nothing to save. Stop right here.
         return 
 
-    file_exists = os.path.isfile(LOG_FILE_PATH)
-
-    with open(LOG_FILE_PATH, mode='a', newline='', encoding='utf-8') as csvfile:
-        fieldnames =log_entries[0].keys()
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-
-        # We only write the header row if the file is brand new.
-        if not file_exists:
-            writer.writeheader()
-        
-        # for entry in log_entries:
-        # The Scribe writes all our processed log entries to the file.
-        writer.writerows(log_entries)
+    # The Scribe writes all our processed log entries to the file.
+    _get_log_writer().writerows(log_entries)
     
     print(f"Successfully logged {len(log_entries)} entries to {LOG_FILE_PATH}")
 
@@ -226,23 +330,22 @@ def send_slack_alert(flagged_flights):
     if not flagged_flights:
         print("No flights flagged for alert. No Slack message sent.")
         return
-    
 
-    message_lines = [
-        f":warning: *Alert: {len(flagged_flights)} flights at {AIRPORT_NAME} ({AIRPORT_IATA}) have been on the ground for over {TURNAROUND_THRESHOLD_MINUTES} minutes!* :warning:",
-        "",
+    header = (
+        f":warning: *Alert: {len(flagged_flights)} flights at {AIRPORT_NAME} ({AIRPORT_IATA}) have been on the ground for over {TURNAROUND_THRESHOLD_MINUTES} minutes!* :warning:\n"
+        "\n"
         "Here are the details:"
-    ]
+    )
 
-    for flight in flagged_flights:
-        line = (            
-            f"\n*- Flight {flight['flight_iata']}* ({flight['airline']})\n"
-            f"  - Arrived from: {flight['origin_country']}\n"
-            f"  - On ground for: *{flight['minutes_on_ground']} minutes*\n"
-        )
-        message_lines.append(line)
-    
-    message = "\n".join(message_lines)
+    # One join over a generator: no intermediate list of lines to grow
+    details = "\n".join(
+        f"\n*- Flight {flight.flight_iata}* ({flight.airline})\n"
+        f"  - Arrived from: {flight.origin_country}\n"
+        f"  - On ground for: *{flight.minutes_on_ground} minutes*\n"
+        for flight in flagged_flights
+    )
+
+    message = header + "\n" + details
 
     payload = {
         "text": message
@@ -250,24 +353,57 @@ def send_slack_alert(flagged_flights):
 
     try:
         print("Sending Slack alert...")
-        response = requests.post(SLACK_WEBHOOK_URL, json=payload)
+        response = SESSION.post(_env()['slack'], json=payload, timeout=15)
         response.raise_for_status()
+        _mark_alerted([flight.flight_iata for flight in flagged_flights])
         print("Slack alert sent successfully.")
     except requests.exceptions.RequestException as e:
         print(f"Error: could not send Slack alert. {e}")
     
 # SECTION 5: MAIN EXECUTION FLOW
-if __name__ == "__main__":
+
+def run_once():
+    """Runs one monitor pass: fetch, process and log, then alert."""
     print(f"--- Starting Airport Operations Monitor at {datetime.now()} ---")
-    
+
     # 1. Fetch the data using our NEW OpenSky function
     raw_flights = fetch_opensky_data()
-    
+
     # 2. Process, log, and identify flights to alert on
     flights_to_alert = process_and_log_data(raw_flights)
-    
+
+    # Push this pass's rows to disk so the reporter can see them right away
+    _flush_logs()
+
     # 3. Send an alert if necessary
     send_slack_alert(flights_to_alert)
-    
+
     print(f"--- Monitor run finished at {datetime.now()} ---")
-    
\ No newline at end of file
+
+def main():
+    """Runs a single monitor pass, the way cron invokes the script."""
+    run_once()
+
+def main_loop():
+    """
+    Runs a monitor pass every POLL_INTERVAL_SECONDS in one long-lived process.
+    The HTTP connection pool, the CSV handle and the tracker database stay open
+    between passes.
+    """
+    while True:
+        try:
+            run_once()
+        except Exception as e:
+            # Keep the daemon alive; the next pass starts from a fresh fetch
+            print(f"Error: monitor pass failed. {e}")
+
+        time.sleep(POLL_INTERVAL_SECONDS)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Monitor aircraft turnarounds and alert on long ones.")
+    parser.add_argument('--daemon', action='store_true', help="keep running and poll every POLL_INTERVAL_SECONDS instead of exiting after one pass")
+
+    if parser.parse_args().daemon:
+        main_loop()
+    else:
+        main()
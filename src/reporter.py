@@ -1,31 +1,243 @@
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 # import seaborn as sns
-# import os
-from config import AIRPORT_NAME, LOG_FILE_PATH, REPORT_IMAGE_PATH
+import os
+import hashlib
+from config import AIRPORT_NAME, LOG_FILE_PATH, REPORT_IMAGE_PATH, CLEANED_CACHE_PATH
 from datetime import datetime
 
+# Columns the report actually reads; everything else in the log is skipped at parse time
+NEEDED_COLS = ('log_timestamp_utc', 'flight_iata', 'origin_country', 'last_contact_time_utc', 'minutes_on_ground')
+
+# Column types for pandas' C engine: callsigns are always parsed as strings (never as numbers),
+# and whole minutes fit float32 exactly, at half the memory traffic of float64
+CSV_DTYPES = {'flight_iata': str, 'minutes_on_ground': 'float32'}
+
+# Logs bigger than this are streamed in chunks of CHUNK_SIZE rows instead of loaded whole
+LARGE_LOG_BYTES = 256 * 1024 * 1024
+CHUNK_SIZE = 100_000
+
+# _latest_row_per_group compiled by numba, set on first use by a large log (False if numba isn't installed)
+_LATEST_ROW_KERNEL = None
+
+def _parse_timestamps(df):
+    """Converts the log timestamps to UTC datetimes, for frames read by pandas' C engine."""
+    # monitor.py always writes isoformat() strings, so skip per-row format inference
+    df['log_timestamp_utc'] = pd.to_datetime(df['log_timestamp_utc'], utc=True, format='ISO8601', cache=True)
+    return df
+
+def _read_log_csv():
+    """
+    Reads the needed columns of the turnaround log CSV.
+    Uses pyarrow's multithreaded CSV reader when available, with the column types given up front:
+    timestamps are parsed natively and callsigns arrive dictionary-encoded (a pandas category).
+    Falls back to pandas' C engine if pyarrow isn't installed.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.csv as pv
+    except ImportError:
+        return _parse_timestamps(pd.read_csv(LOG_FILE_PATH, engine='c', usecols=NEEDED_COLS, dtype=CSV_DTYPES))
+
+    table = pv.read_csv(
+        LOG_FILE_PATH,
+        read_options=pv.ReadOptions(use_threads=True, block_size=8 << 20),
+        convert_options=pv.ConvertOptions(
+            include_columns=list(NEEDED_COLS),
+            column_types={
+                'log_timestamp_utc': pa.timestamp('ns', tz='UTC'),
+                'flight_iata': pa.dictionary(pa.int32(), pa.string()),
+                'last_contact_time_utc': pa.string(),  # Only displayed, so keep the logged text as-is
+                'minutes_on_ground': pa.float32()
+            }
+        )
+    )
+    return table.to_pandas()
+
+def _iter_log_chunks():
+    """
+    Yields the needed columns of the turnaround log CSV, CHUNK_SIZE rows at a time.
+    Uses pandas' C engine, since the pyarrow engine can't read in chunks.
+    """
+    with pd.read_csv(LOG_FILE_PATH, engine='c', usecols=NEEDED_COLS, dtype=CSV_DTYPES, chunksize=CHUNK_SIZE) as reader:
+        for chunk in reader:
+            yield _parse_timestamps(chunk)
+
+def _latest_row_per_group(codes, timestamps, group_count):
+    """
+    Returns, for each group code, the position of its newest row (-1 if it has none).
+    On tied timestamps the later row wins, like drop_duplicates(keep='last').
+    Only run compiled, through _compiled_latest_row_kernel().
+    """
+    best_ts = np.full(group_count, np.iinfo(np.int64).min, np.int64)
+    best_row = np.full(group_count, -1, np.int64)
+    for i in range(codes.size):
+        code = codes[i]
+        if code >= 0 and timestamps[i] >= best_ts[code]:
+            best_ts[code] = timestamps[i]
+            best_row[code] = i
+    return best_row
+
+def _compiled_latest_row_kernel():
+    """
+    Returns _latest_row_per_group compiled with numba, or None if numba isn't installed.
+    numba is imported on first use, so runs on small logs never pay for the import or the JIT cache load.
+    """
+    global _LATEST_ROW_KERNEL
+
+    if _LATEST_ROW_KERNEL is None:
+        try:
+            from numba import njit
+        except ImportError:
+            _LATEST_ROW_KERNEL = False
+        else:
+            _LATEST_ROW_KERNEL = njit(cache=True)(_latest_row_per_group)
+
+    return _LATEST_ROW_KERNEL or None
+
+def _latest_per_flight(df, large_log=False):
+    """
+    Keeps only the most recent entry for each flight.
+    Only the callsign codes and integer timestamps are processed; the rest of the frame is touched once, in the final gather.
+    A NumPy lexsort of the two key arrays finds each flight's newest row.
+    For large logs, a numba-compiled single pass does it instead when numba is installed.
+    """
+    codes, flights = pd.factorize(df['flight_iata'])
+    timestamps = df['log_timestamp_utc'].to_numpy(dtype='datetime64[ns]').view(np.int64)
+
+    kernel = _compiled_latest_row_kernel() if large_log else None
+    if kernel is not None:
+        best_row = kernel(codes.astype(np.int32), timestamps, len(flights))
+        return df.iloc[best_row[best_row >= 0]]
+
+    # Sorted by code, then timestamp, so each code's newest row is the last of its run.
+    order = np.lexsort((timestamps, codes))
+    order = order[codes[order] >= 0]  # Rows without a callsign (code -1) are dropped
+    sorted_codes = codes[order]
+    run_ends = np.r_[sorted_codes[1:] != sorted_codes[:-1], True] if sorted_codes.size else np.zeros(0, bool)
+    return df.iloc[order[run_ends]]
+
+def _read_cleaned_cache(log_stamp):
+    """
+    Returns the cleaned data saved by a previous run, if it was built from this exact version of the CSV log.
+    log_stamp is the log's mtime and size, which the cache stores in its Parquet metadata.
+    Returns None when there is no usable cache (missing, stale, damaged, or pyarrow not installed).
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return None
+
+    try:
+        cache_file = pq.ParquetFile(CLEANED_CACHE_PATH)
+        if (cache_file.schema_arrow.metadata or {}).get(b'log_stamp') != log_stamp.encode():
+            return None
+        return cache_file.read().to_pandas()
+    except (OSError, pa.ArrowException):
+        return None  # A truncated or corrupt cache is just rebuilt from the CSV
+
+def _write_cleaned_cache(cleaned_df, log_stamp):
+    """
+    Saves the cleaned data as Parquet, tagged with the log's stamp, so the next run can skip parsing the CSV.
+    Written to a temp file and moved into place with os.replace, so a reader never sees a half-written cache.
+    """
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError:
+        return  # Caching needs pyarrow; without it every run parses the CSV
+
+    table = pa.Table.from_pandas(cleaned_df)
+    table = table.replace_schema_metadata({**table.schema.metadata, b'log_stamp': log_stamp.encode()})
+    tmp_path = CLEANED_CACHE_PATH + '.tmp'
+    try:
+        pq.write_table(table, tmp_path, compression='zstd')
+        os.replace(tmp_path, CLEANED_CACHE_PATH)
+    except OSError as e:
+        print(f"Warning: could not write the cleaned data cache. {e}")
+
+def _clean_with_polars():
+    """
+    Loads and de-duplicates the log in a single lazy Polars query.
+    Polars fuses the read, sort and de-duplication and runs them multithreaded;
+    only the cleaned result is converted to pandas.
+    Returns None if polars (or pyarrow, which the conversion needs) isn't installed.
+    """
+    try:
+        import polars as pl
+        import pyarrow  # noqa: F401
+    except ImportError:
+        return None
+
+    print("Cleaning data with Polars...")
+    cleaned = (
+        pl.scan_csv(LOG_FILE_PATH, schema_overrides={
+            'flight_iata': pl.Categorical,
+            'last_contact_time_utc': pl.String,
+            'minutes_on_ground': pl.Float32
+        })
+        .select(NEEDED_COLS)
+        .with_columns(pl.col('log_timestamp_utc').str.to_datetime(time_zone='UTC', time_unit='ns'))
+        .sort('log_timestamp_utc', maintain_order=True)  # Stable, so keep='last' picks the later of tied rows
+        .unique(subset=['flight_iata'], keep='last', maintain_order=True)  # Deterministic row order, so ties in the analysis resolve the same way every run
+        .collect()
+    )
+    return cleaned.to_pandas()
+
+def _clean_with_pandas(large_log):
+    """
+    Loads and de-duplicates the log with pandas.
+    Large logs are streamed in chunks, each reduced to its newest row per flight as it is read,
+    so memory stays bounded by the chunk size plus the number of flights.
+    """
+    if large_log:
+        df = pd.concat(_latest_per_flight(chunk, large_log=True) for chunk in _iter_log_chunks())
+    else:
+        df = _read_log_csv()
+
+    #Callsigns repeat on every run, so store them as a category: grouping and counting then work on int codes.
+    #The pyarrow reader already returns one; the C engine returns strings that are converted once here.
+    if not isinstance(df['flight_iata'].dtype, pd.CategoricalDtype):
+        df['flight_iata'] = df['flight_iata'].astype('category')
+    #Data Cleaning and Pre-processing
+    print("Cleaning data...")
+
+    #De-duplication: Keep only the most recent entry for each flight
+    return _latest_per_flight(df, large_log)
+
 def load_and_clean_data():
     """
     Loads the turnaround log CSV, cleans it, and prepares it for analysis.
     - Converts timestamps to datetime objects.
     - Handles duplicates by keeping only the most recent entry for each flight.
     - Ensures turnaround times are numeric and handles missing values.
+    If the log hasn't changed since the last run, the cleaned Parquet cache is returned instead.
+    Large logs go through Polars when it is installed.
     """
-    print(f"Loading data from {LOG_FILE_PATH}...")
     try:
-        df = pd.read_csv(LOG_FILE_PATH)
+        # Stat the log before reading it: rows appended while it is being read
+        # then make the cache stale instead of being hidden behind it.
+        log_stat = os.stat(LOG_FILE_PATH)
+        log_stamp = f'{log_stat.st_mtime_ns}:{log_stat.st_size}'
+
+        cleaned_df = _read_cleaned_cache(log_stamp)
+        if cleaned_df is not None:
+            print(f"Log unchanged since last run. Loaded {len(cleaned_df)} unique aircraft from {CLEANED_CACHE_PATH}.")
+            return cleaned_df
+
+        print(f"Loading data from {LOG_FILE_PATH}...")
+        large_log = log_stat.st_size > LARGE_LOG_BYTES
+        cleaned_df = _clean_with_polars() if large_log else None
+        if cleaned_df is None:
+            cleaned_df = _clean_with_pandas(large_log)
     except FileNotFoundError:
         print(f"Error: The file {LOG_FILE_PATH} was not found. Please run monitor.py first to generate some data.")
         return pd.DataFrame()  # Return empty DataFrame if file not found
-    
-    df['flight_iata'] = df['flight_iata'].astype(str)
-    #Data Cleaning and Pre-processing
-    print("Cleaning data...")
-    df['log_timestamp_utc'] = pd.to_datetime(df['log_timestamp_utc'], utc=True)
 
-    #De-duplication: Keep only the most recent entry for each flight
-    cleaned_df = df.sort_values('log_timestamp_utc').drop_duplicates(subset=['flight_iata'], keep='last')
+    _write_cleaned_cache(cleaned_df, log_stamp)
 
     print(f"Data loaded and cleaned. Found {len(cleaned_df)} unique aircraft on the ground.")
     return cleaned_df
@@ -42,23 +254,61 @@ def analyze_results(df):
     
     print("Analyzing data...")
 
-    unique_aircraft_count = df['flight_iata'].nunique() # Count of unique aircraft
+    # Count of unique aircraft. load_and_clean_data leaves no unused categories,
+    # so the category count answers this without scanning the column.
+    flights = df['flight_iata']
+    if isinstance(flights.dtype, pd.CategoricalDtype):
+        unique_aircraft_count = flights.cat.categories.size
+    else:
+        unique_aircraft_count = pd.unique(flights.dropna().to_numpy()).size
+
+    # Both metrics come from the same plain NumPy array instead of separate pandas reductions.
+    # The nan* variants skip missing values, like pandas' .mean() and .idxmax() did.
+    minutes = df['minutes_on_ground'].to_numpy(dtype=np.float64, na_value=np.nan)
+    average_minutes_on_ground = np.nanmean(minutes) # Average turnaround time
 
-    average_minutes_on_ground = df['minutes_on_ground'].mean() # Average turnaround time
+    # np.nanargmax() gives the row position of the maximum value,
+    # and .iloc[] retrieves the entire row for that aircraft without an index lookup.
+    row = df.iloc[int(np.nanargmax(minutes))]
 
-    # .idxmax() finds the index (row number) of the maximum value in a column.
-    # We then use .loc[] to retrieve the entire row for that aircraft.
-    longest_turnaround_flight = df.loc[df['minutes_on_ground'].idxmax()]
+    # Only the fields the summary prints are kept, as plain Python values,
+    # so the results don't hold on to a pandas Series.
+    longest_turnaround_flight = {
+        'flight_iata': str(row['flight_iata']),
+        'minutes_on_ground': float(row['minutes_on_ground']),
+        'origin_country': row.get('origin_country', 'N/A'),
+        'last_contact_time_utc': row.get('last_contact_time_utc', 'N/A'),
+    }
 
     analysis_results = {
-        'unique_aircraft_count': unique_aircraft_count,
-        'average_minutes_on_ground': average_minutes_on_ground,
-        'longest_turnaround_flight': longest_turnaround_flight 
+        'unique_aircraft_count': int(unique_aircraft_count),
+        'average_minutes_on_ground': float(average_minutes_on_ground),
+        'longest_turnaround_flight': longest_turnaround_flight
     }
 
     print("Analysis complete.")
     return analysis_results
 
+def _chart_digest(labels, minutes):
+    """Fingerprints the bars of the top-10 chart, rounded the way their labels are."""
+    key = (AIRPORT_NAME, tuple(labels), tuple(round(float(value), 1) for value in minutes))
+    return hashlib.blake2b(repr(key).encode(), digest_size=16).hexdigest()
+
+def _read_text(path):
+    """Returns the contents of a small text file, or None if it doesn't exist."""
+    try:
+        with open(path, encoding='utf-8') as f:
+            return f.read()
+    except FileNotFoundError:
+        return None
+
+def _write_text_atomic(path, text):
+    """Writes a small text file via a temp file and os.replace, so it is never seen half-written."""
+    tmp_path = path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
 def create_visual_report(df, analysis_results):
     """
     Creates and saves a bar chart of the top 10 longest turnaround times.
@@ -70,25 +320,44 @@ def create_visual_report(df, analysis_results):
 
     print("Creating visual report...")
 
-    top_10_flights = df.nlargest(10, 'minutes_on_ground').sort_values('minutes_on_ground', ascending=True)
+    # Partition out the 10 largest values in O(N), then sort just those 10 (ascending, for barh).
+    # Missing values become -inf so they are never picked, as with nlargest().
+    minutes = df['minutes_on_ground'].to_numpy(dtype=np.float64, na_value=-np.inf)
+    k = min(10, len(minutes))
+    top_idx = np.argpartition(minutes, -k)[-k:]
+    top_idx = top_idx[np.argsort(minutes[top_idx], kind='stable')]
+    top_10_flights = df.iloc[top_idx[np.isfinite(minutes[top_idx])]]
+
+    # The chart only depends on these bars (and the airport name), so skip re-rendering an identical one
+    labels = top_10_flights['flight_iata'].astype(str)
+    chart_digest = _chart_digest(labels, top_10_flights['minutes_on_ground'])
+    digest_path = REPORT_IMAGE_PATH + '.hash'
+    if os.path.exists(REPORT_IMAGE_PATH) and _read_text(digest_path) == chart_digest:
+        print(f"Top 10 unchanged since the last report. Keeping {REPORT_IMAGE_PATH}.")
+        return
+
+    # Build the figure directly on an Agg canvas; no pyplot global state involved
+    fig = Figure(figsize=(12, 6))
+    ax = fig.subplots()
 
-    plt.figure(figsize=(12, 6))
+    bars = ax.barh(labels, top_10_flights['minutes_on_ground'], color='skyblue')
 
-    print(top_10_flights['flight_iata'])
-    print(top_10_flights['minutes_on_ground'])
-    plt.barh(top_10_flights['flight_iata'], top_10_flights['minutes_on_ground'], color='skyblue')
+    ax.set_xlabel('Time on Ground (Minutes)')
+    ax.set_ylabel('Flight Callsign')
+    ax.set_title(f'Top 10 Longest Turnaround Times at {AIRPORT_NAME}')
+    ax.grid(axis='x', alpha=0.75)
 
-    plt.xlabel('Time on Ground (Minutes)')
-    plt.ylabel('Flight Callsign')
-    plt.title(f'Top 10 Longest Turnaround Times at {AIRPORT_NAME}')
-    plt.grid(axis='x', alpha=0.75)
+    # Label every bar's end in one call
+    ax.bar_label(bars, labels=[f'{value:.1f} min' for value in top_10_flights['minutes_on_ground']], padding=3, label_type='edge')
 
-    for index, value in enumerate(top_10_flights['minutes_on_ground']):
-        plt.text(value, index, f' {value:.1f} min', va='center')
+    fig.tight_layout()
+    # Render to a temp file and swap it in, so a reader never sees a half-written PNG.
+    # zlib level 1 encodes much faster, for a slightly larger file.
+    tmp_path = REPORT_IMAGE_PATH + '.tmp'
+    FigureCanvasAgg(fig).print_figure(tmp_path, format='png', pil_kwargs={'compress_level': 1})
+    os.replace(tmp_path, REPORT_IMAGE_PATH)
 
-    plt.tight_layout()
-    plt.savefig(REPORT_IMAGE_PATH)
-    plt.close()
+    _write_text_atomic(digest_path, chart_digest)
 
     print(f"Visual report saved successfully to {REPORT_IMAGE_PATH}.")
 
@@ -106,9 +375,10 @@ if __name__ == "__main__":
         print(f"Total Unique Aircraft Logged: {report_data['unique_aircraft_count']}")
         print(f"Average Time on Ground: {report_data['average_minutes_on_ground']:.2f} minutes")
         print("\n--- Flight with Longest Turnaround ---")
-        print(f"Callsign: {report_data['longest_turnaround_flight']['flight_iata']}")
-        print(f"Time on Ground: {int(report_data['longest_turnaround_flight']['minutes_on_ground'])} minutes")
-        print(f"Origin Country: {report_data['longest_turnaround_flight'].get('origin_country', 'N/A')}")
-        print(f"Last Contact (UTC): {report_data['longest_turnaround_flight'].get('last_contact_time_utc', 'N/A')}")
+        longest = report_data['longest_turnaround_flight']
+        print(f"Callsign: {longest['flight_iata']}")
+        print(f"Time on Ground: {int(longest['minutes_on_ground'])} minutes")
+        print(f"Origin Country: {longest['origin_country']}")
+        print(f"Last Contact (UTC): {longest['last_contact_time_utc']}")
 
     print(f"\n--- Reporter run finished. ---")
\ No newline at end of file